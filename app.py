@@ -1,7 +1,9 @@
 import os
+import gzip
 import logging
-from flask import Flask, render_template, request, jsonify, flash, redirect, url_for
-from flask_cors import CORS
+import orjson
+from collections import namedtuple
+from flask import Flask, Response, render_template, request, flash
 from werkzeug.exceptions import HTTPException
 import traceback
 
@@ -15,6 +17,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Default number of books returned by /api/books/popular
+DEFAULT_POPULAR_LIMIT = 20
+
+# Maximum number of titles accepted by /api/books/recommendations/batch
+MAX_BATCH_BOOKS = 100
+
+# A JSON payload encoded once, kept both plain and gzip-compressed
+JsonBlob = namedtuple('JsonBlob', ['raw', 'gzip'])
+
 def create_app(config_name='default'):
     """Application factory pattern"""
     app = Flask(__name__)
@@ -22,18 +33,42 @@ def create_app(config_name='default'):
     # Load configuration
     app.config.from_object(config[config_name])
     
-    # Enable CORS
-    CORS(app)
+    # Enable CORS with a fixed allowlist header; leave CORS_ALLOW_ORIGIN
+    # empty when a reverse proxy adds the headers instead
+    allow_origin = app.config['CORS_ALLOW_ORIGIN']
+    if allow_origin:
+        @app.after_request
+        def add_cors_headers(response):
+            response.headers['Access-Control-Allow-Origin'] = allow_origin
+            if request.method == 'OPTIONS':
+                response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+                response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
+            return response
     
     # Initialize book recommender
     try:
-        recommender = BookRecommender()
-        app.recommender = recommender
+        app.recommender = BookRecommender.get_instance()
         logger.info("Book recommender initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize book recommender: {e}")
         app.recommender = None
     
+    # Encode and compress the static JSON payloads once; they never change
+    # after the models are loaded
+    try:
+        available_books = app.recommender.get_available_books() if app.recommender else []
+        app.available_books_json = make_json_blob(available_books)
+    except Exception as e:
+        logger.error(f"Failed to serialize available books: {e}")
+        app.available_books_json = make_json_blob([])
+    
+    try:
+        popular_books = app.recommender.get_popular_books(limit=DEFAULT_POPULAR_LIMIT) if app.recommender else []
+        app.popular_books_json = make_json_blob({'books': serialize_books(popular_books)})
+    except Exception as e:
+        logger.error(f"Failed to serialize popular books: {e}")
+        app.popular_books_json = None
+    
     # Register error handlers
     register_error_handlers(app)
     
@@ -42,6 +77,31 @@ def create_app(config_name='default'):
     
     return app
 
+def ojson(data, status=200):
+    """Build a JSON response using orjson instead of the stdlib encoder"""
+    return Response(orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY),
+                    status=status, mimetype='application/json')
+
+def make_json_blob(data):
+    """Encode data as JSON once and keep a gzip-compressed copy"""
+    raw = orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY)
+    return JsonBlob(raw, gzip.compress(raw))
+
+def blob_response(blob, max_age):
+    """Serve a precomputed JSON blob, compressed if the client accepts gzip"""
+    if request.accept_encodings['gzip']:
+        response = Response(blob.gzip, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(blob.raw, mimetype='application/json')
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f'public, max-age={max_age}'
+    return response
+
+def serialize_books(books):
+    """Convert book records into dicts for JSON responses"""
+    return [book._asdict() for book in books]
+
 def register_error_handlers(app):
     """Register error handlers for the application"""
     
@@ -83,9 +143,7 @@ def register_routes(app):
                 flash('Book recommender system is currently unavailable', 'error')
                 return render_template('recommend.html', recommendations=[])
             
-            # Get available books for autocomplete
-            available_books = app.recommender.get_available_books()
-            return render_template('recommend.html', recommendations=[], available_books=available_books)
+            return render_template('recommend.html', recommendations=[])
         except Exception as e:
             logger.error(f"Error in recommend page: {e}")
             flash('An error occurred while loading the recommendation page', 'error')
@@ -96,87 +154,141 @@ def register_routes(app):
         """Get book recommendations"""
         try:
             if app.recommender is None:
-                flash('Book recommender system is currently unavailable', 'error')
-                return redirect(url_for('recommend_page'))
+                return render_template('recommend.html', recommendations=[],
+                                     page_messages=[('error', 'Book recommender system is currently unavailable')])
             
             user_input = request.form.get('user_input', '').strip()
             
             if not user_input:
-                flash('Please enter a book title', 'warning')
-                return redirect(url_for('recommend_page'))
+                return render_template('recommend.html', recommendations=[],
+                                     page_messages=[('warning', 'Please enter a book title')])
             
             # Get recommendations
             recommendations = app.recommender.get_book_recommendations(user_input, num_recommendations=5)
             
             if not recommendations:
-                flash(f'No recommendations found for "{user_input}". Please try a different book title.', 'warning')
-                return redirect(url_for('recommend_page'))
+                message = f'No recommendations found for "{user_input}". Please try a different book title.'
+                return render_template('recommend.html', recommendations=[], search_query=user_input,
+                                     page_messages=[('warning', message)])
             
-            # Get available books for autocomplete
-            available_books = app.recommender.get_available_books()
-            
-            flash(f'Found {len(recommendations)} recommendations for "{user_input}"', 'success')
+            message = f'Found {len(recommendations)} recommendations for "{user_input}"'
             return render_template('recommend.html', recommendations=recommendations, 
-                                 search_query=user_input, available_books=available_books)
+                                 search_query=user_input, page_messages=[('success', message)])
             
         except Exception as e:
             logger.error(f"Error in recommend_books: {e}")
-            flash('An error occurred while getting recommendations', 'error')
-            return redirect(url_for('recommend_page'))
+            return render_template('recommend.html', recommendations=[],
+                                 page_messages=[('error', 'An error occurred while getting recommendations')])
     
     @app.route('/search')
     def search_books():
         """Search books API endpoint"""
         try:
             if app.recommender is None:
-                return jsonify({'error': 'Book recommender system is currently unavailable'}), 503
+                return ojson({'error': 'Book recommender system is currently unavailable'}, 503)
             
             query = request.args.get('q', '').strip()
             
             if not query:
-                return jsonify({'books': []})
+                return ojson({'books': []})
             
             books = app.recommender.search_books(query, limit=10)
-            return jsonify({'books': books})
+            return ojson({'books': serialize_books(books)})
             
         except Exception as e:
             logger.error(f"Error in search_books: {e}")
-            return jsonify({'error': 'An error occurred while searching'}), 500
+            return ojson({'error': 'An error occurred while searching'}, 500)
     
     @app.route('/api/books/popular')
     def api_popular_books():
         """API endpoint for popular books"""
         try:
             if app.recommender is None:
-                return jsonify({'error': 'Book recommender system is currently unavailable'}), 503
+                return ojson({'error': 'Book recommender system is currently unavailable'}, 503)
+            
+            limit = request.args.get('limit', DEFAULT_POPULAR_LIMIT, type=int)
+            if limit < 0:
+                return ojson({'error': 'Limit must be a non-negative integer'}, 400)
+            
+            if limit == DEFAULT_POPULAR_LIMIT and app.popular_books_json is not None:
+                return blob_response(app.popular_books_json, max_age=600)
             
-            limit = request.args.get('limit', 20, type=int)
             books = app.recommender.get_popular_books(limit=limit)
-            return jsonify({'books': books})
+            return ojson({'books': serialize_books(books)})
             
         except Exception as e:
             logger.error(f"Error in api_popular_books: {e}")
-            return jsonify({'error': 'An error occurred while fetching popular books'}), 500
+            return ojson({'error': 'An error occurred while fetching popular books'}, 500)
+    
+    @app.route('/api/books/titles')
+    def api_book_titles():
+        """API endpoint for all book titles used by autocomplete"""
+        return blob_response(app.available_books_json, max_age=3600)
     
     @app.route('/api/books/recommendations')
     def api_recommendations():
         """API endpoint for book recommendations"""
         try:
             if app.recommender is None:
-                return jsonify({'error': 'Book recommender system is currently unavailable'}), 503
+                return ojson({'error': 'Book recommender system is currently unavailable'}, 503)
             
             book_title = request.args.get('book', '').strip()
             limit = request.args.get('limit', 5, type=int)
             
             if not book_title:
-                return jsonify({'error': 'Book title is required'}), 400
+                return ojson({'error': 'Book title is required'}, 400)
+            
+            if limit < 0:
+                return ojson({'error': 'Limit must be a non-negative integer'}, 400)
             
             recommendations = app.recommender.get_book_recommendations(book_title, num_recommendations=limit)
-            return jsonify({'recommendations': recommendations})
+            result = {'recommendations': serialize_books(recommendations)}
+            max_recommendations = app.recommender.max_recommendations
+            if limit > max_recommendations:
+                result['warning'] = f'Limit capped at {max_recommendations} recommendations per book'
+            return ojson(result)
             
         except Exception as e:
             logger.error(f"Error in api_recommendations: {e}")
-            return jsonify({'error': 'An error occurred while getting recommendations'}), 500
+            return ojson({'error': 'An error occurred while getting recommendations'}, 500)
+    
+    @app.route('/api/books/recommendations/batch', methods=['POST'])
+    def api_batch_recommendations():
+        """API endpoint for recommendations for several books at once"""
+        try:
+            if app.recommender is None:
+                return ojson({'error': 'Book recommender system is currently unavailable'}, 503)
+            
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict):
+                data = {}
+            book_titles = data.get('books')
+            limit = data.get('limit', 5)
+            
+            if (not isinstance(book_titles, list) or not book_titles or
+                    not all(isinstance(title, str) for title in book_titles)):
+                return ojson({'error': 'A non-empty list of book titles is required'}, 400)
+            
+            if len(book_titles) > MAX_BATCH_BOOKS:
+                return ojson({'error': f'At most {MAX_BATCH_BOOKS} book titles are allowed per request'}, 400)
+            
+            # bool is a subclass of int, so reject it explicitly
+            if not isinstance(limit, int) or isinstance(limit, bool) or limit < 0:
+                return ojson({'error': 'Limit must be a non-negative integer'}, 400)
+            
+            book_titles = [title.strip() for title in book_titles]
+            recommendations = app.recommender.get_batch_recommendations(book_titles, num_recommendations=limit)
+            result = {'recommendations': {
+                title: serialize_books(books) for title, books in recommendations.items()
+            }}
+            max_recommendations = app.recommender.max_recommendations
+            if limit > max_recommendations:
+                result['warning'] = f'Limit capped at {max_recommendations} recommendations per book'
+            return ojson(result)
+            
+        except Exception as e:
+            logger.error(f"Error in api_batch_recommendations: {e}")
+            return ojson({'error': 'An error occurred while getting recommendations'}, 500)
     
     @app.route('/health')
     def health_check():
@@ -186,10 +298,10 @@ def register_routes(app):
                 'status': 'healthy',
                 'recommender_available': app.recommender is not None
             }
-            return jsonify(status)
+            return ojson(status)
         except Exception as e:
             logger.error(f"Health check failed: {e}")
-            return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
+            return ojson({'status': 'unhealthy', 'error': str(e)}, 500)
 
 # Create the application instance
 app = create_app(os.getenv('FLASK_ENV', 'default'))
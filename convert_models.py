@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Convert the pickled model files into faster-loading formats
+
+- popular.pkl / books.pkl -> Feather (when pyarrow is installed)
+- similarity_scores.pkl   -> similarity_topk.npz with the top neighbors of
+                             each book (int32 indices, float16 scores)
+- pt.pkl                  -> re-pickled with protocol 5
+
+Usage: python convert_models.py [model_path]
+"""
+
+import os
+import sys
+import pickle
+import numpy as np
+
+from models.book_recommender import HAS_PYARROW, TOP_K, top_k_neighbors
+
+def load_pickle(model_path, name):
+    """Load a pickled model file"""
+    with open(os.path.join(model_path, f'{name}.pkl'), 'rb') as f:
+        return pickle.load(f)
+
+def main():
+    """Main function to convert the model files"""
+    model_path = sys.argv[1] if len(sys.argv) > 1 else './'
+
+    try:
+        for name in ['popular', 'books']:
+            df = load_pickle(model_path, name)
+            if HAS_PYARROW:
+                df.reset_index(drop=True).to_feather(os.path.join(model_path, f'{name}.feather'))
+                print(f"✅ Wrote {name}.feather")
+            else:
+                print(f"⚠️  pyarrow is not installed, keeping {name}.pkl")
+
+        pt = load_pickle(model_path, 'pt')
+        with open(os.path.join(model_path, 'pt.pkl'), 'wb') as f:
+            pickle.dump(pt, f, protocol=5)
+        print("✅ Re-pickled pt.pkl with protocol 5")
+
+        top_idx, top_scores = top_k_neighbors(load_pickle(model_path, 'similarity_scores'), TOP_K)
+        np.savez(os.path.join(model_path, 'similarity_topk.npz'), indices=top_idx, scores=top_scores)
+        print(f"✅ Wrote similarity_topk.npz ({top_idx.shape[1]} neighbors per book)")
+
+    except Exception as e:
+        print(f"❌ Error converting models: {e}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+"""
+Gunicorn configuration for the Book Recommender application
+"""
+
+import os
+import multiprocessing
+
+# Bind to the port provided by the platform
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Threaded workers handle concurrent requests while waiting on I/O
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 5))
+
+# Load the app (and its models) once in the master so forked workers share
+# the model memory copy-on-write instead of each loading their own copy
+preload_app = True
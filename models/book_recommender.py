@@ -2,11 +2,78 @@ import pickle
 import os
 import numpy as np
 import pandas as pd
-from typing import List, Dict, Any, Optional
+from scipy.sparse import csr_matrix
+from typing import List, Dict, Any, Optional, Tuple
 import logging
+from collections import namedtuple
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Candidate files for each model, in order of preference. Feather files load
+# faster than pickles. similarity_topk.npz (written by convert_models.py) holds
+# the precomputed neighbors; a full matrix in a legacy .npy or the .pkl is only
+# an input that gets reduced to the same neighbors at startup.
+MODEL_FILES = {
+    'popular': ['popular.feather', 'popular.pkl'],
+    'pt': ['pt.pkl'],
+    'books': ['books.feather', 'books.pkl'],
+    'similarity_scores': ['similarity_topk.npz', 'similarity_scores.npy', 'similarity_scores.pkl'],
+}
+
+# Number of nearest neighbors kept per book for serving recommendations
+TOP_K = 20
+
+# Lightweight records returned for books; templates read them by attribute
+# and JSON endpoints convert them with _asdict()
+Book = namedtuple('Book', ['title', 'author', 'image_url', 'votes', 'rating'])
+RecommendedBook = namedtuple('RecommendedBook', ['title', 'author', 'image_url', 'similarity_score'])
+
+# Recommenders shared per model path, see BookRecommender.get_instance
+_instances = {}
+
+def _trigrams(text: str) -> set:
+    """Return the set of 3-character substrings of a string"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def top_k_neighbors(similarity_scores: np.ndarray, k: int = TOP_K,
+                    chunk_size: int = 1024) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the k most similar books for every book
+    
+    Args:
+        similarity_scores: Square book-by-book similarity matrix
+        k: Number of neighbors to keep per book
+        chunk_size: Number of rows processed at a time
+        
+    Returns:
+        Tuple of (N, k) int32 neighbor indices and float16 scores, sorted by
+        descending similarity and excluding each book itself
+    """
+    n = similarity_scores.shape[0] if similarity_scores.ndim == 2 else 0
+    k = max(min(k, n - 1), 0)
+    top_idx = np.empty((n, k), dtype=np.int32)
+    top_scores = np.empty((n, k), dtype=np.float16)
+    if k == 0:
+        return top_idx, top_scores
+    
+    for start in range(0, n, chunk_size):
+        block = np.array(similarity_scores[start:start + chunk_size], dtype=np.float32)
+        rows = np.arange(len(block))
+        block[rows, start + rows] = -np.inf
+        idx = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(block, idx, axis=1)
+        order = np.argsort(-scores, axis=1, kind='stable')
+        top_idx[start:start + len(block)] = np.take_along_axis(idx, order, axis=1)
+        top_scores[start:start + len(block)] = np.take_along_axis(scores, order, axis=1)
+    return top_idx, top_scores
+
 class BookRecommender:
     """Book recommendation system using collaborative filtering"""
     
@@ -20,21 +87,45 @@ class BookRecommender:
         self.model_path = model_path
         self.popular_df = None
         self.pt = None
+        self.pt_sparse = None
+        self.pt_index = np.array([], dtype=object)
         self.books = None
         self.similarity_scores = None
+        self.top_idx = np.empty((0, 0), dtype=np.int32)
+        self.top_scores = np.empty((0, 0), dtype=np.float16)
+        self._book_meta = {}
+        self._title_to_pos = {}
+        self._pop_title_lc = None
+        self._pop_author_lc = None
+        self._trigram_idx = {}
+        self._available_books_cache = ()
+        
+        # Per-instance result caches; the models never change after loading
+        self._popular_books_cached = lru_cache(maxsize=32)(self._popular_books)
+        self._search_books_cached = lru_cache(maxsize=256)(self._search_books)
         self._load_models()
     
+    @classmethod
+    def get_instance(cls, model_path: str = './') -> 'BookRecommender':
+        """
+        Get the shared recommender for a model path, loading it on first use
+        
+        Args:
+            model_path: Path to the directory containing model files
+            
+        Returns:
+            The shared BookRecommender instance
+        """
+        if model_path not in _instances:
+            _instances[model_path] = cls(model_path)
+        return _instances[model_path]
+    
     def _load_models(self):
         """Load all pre-trained models and data"""
         try:
             # Check if all required files exist
-            required_files = ['popular.pkl', 'pt.pkl', 'books.pkl', 'similarity_scores.pkl']
-            missing_files = []
-            
-            for file in required_files:
-                file_path = os.path.join(self.model_path, file)
-                if not os.path.exists(file_path):
-                    missing_files.append(file)
+            model_files = {name: self._find_model_file(name) for name in MODEL_FILES}
+            missing_files = [MODEL_FILES[name][-1] for name, path in model_files.items() if path is None]
             
             if missing_files:
                 logger.warning(f"Missing model files: {missing_files}. Creating empty models.")
@@ -42,10 +133,20 @@ class BookRecommender:
                 return
             
             # Load all models
-            self.popular_df = pickle.load(open(f'{self.model_path}popular.pkl', 'rb'))
-            self.pt = pickle.load(open(f'{self.model_path}pt.pkl', 'rb'))
-            self.books = pickle.load(open(f'{self.model_path}books.pkl', 'rb'))
-            self.similarity_scores = pickle.load(open(f'{self.model_path}similarity_scores.pkl', 'rb'))
+            self.popular_df = self._load_model_file(model_files['popular'])
+            self.pt = self._load_model_file(model_files['pt'])
+            self.books = self._load_model_file(model_files['books'])
+            similarity_file = model_files['similarity_scores']
+            if similarity_file.endswith('.npz') and not self._load_top_k(similarity_file):
+                # Stale neighbor table: rebuild it from the full matrix if present
+                similarity_file = self._find_model_file('similarity_scores', skip_top_k=True)
+                if similarity_file is None:
+                    logger.warning("No similarity matrix to rebuild neighbors from. Creating empty models.")
+                    self._create_empty_models()
+                    return
+            if not similarity_file.endswith('.npz'):
+                self.similarity_scores = self._load_model_file(similarity_file)
+            self._build_lookups()
             logger.info("All models loaded successfully")
             
         except Exception as e:
@@ -53,6 +154,62 @@ class BookRecommender:
             logger.info("Creating empty models as fallback")
             self._create_empty_models()
     
+    def _find_model_file(self, name: str, skip_top_k: bool = False) -> Optional[str]:
+        """Return the path of the preferred existing file for a model, if any"""
+        for file in MODEL_FILES[name]:
+            if file.endswith('.feather') and not HAS_PYARROW:
+                continue
+            if file.endswith('.npz') and skip_top_k:
+                continue
+            file_path = os.path.join(self.model_path, file)
+            if os.path.exists(file_path):
+                return file_path
+        return None
+    
+    def _load_top_k(self, file_path: str) -> bool:
+        """
+        Load precomputed neighbors, checking they match the loaded pivot table
+        
+        Args:
+            file_path: Path to the similarity_topk.npz file
+            
+        Returns:
+            True if the neighbors were loaded, False if they are stale
+        """
+        with np.load(file_path) as top_k:
+            top_idx = top_k['indices']
+            top_scores = top_k['scores']
+        
+        # The table must cover every pivot table title with the same number
+        # of neighbors top_k_neighbors would compute for this dataset
+        num_books = len(self.pt.index)
+        expected_shape = (num_books, max(min(TOP_K, num_books - 1), 0))
+        if (top_idx.shape != expected_shape or top_scores.shape != expected_shape or
+                (top_idx.size and (top_idx.min() < 0 or top_idx.max() >= num_books))):
+            logger.warning(f"{os.path.basename(file_path)} does not match pt.pkl "
+                           f"(shape {top_idx.shape}, expected {expected_shape}). Re-run convert_models.py.")
+            return False
+        
+        self.top_idx = top_idx
+        self.top_scores = top_scores
+        return True
+    
+    @property
+    def max_recommendations(self) -> int:
+        """Number of precomputed neighbors, the most recommendations per book"""
+        return self.top_idx.shape[1]
+    
+    def _load_model_file(self, file_path: str) -> Any:
+        """Load a single model file based on its extension"""
+        if file_path.endswith('.npy'):
+            # Legacy full matrix; memory-map it so top_k_neighbors can reduce
+            # it chunk by chunk without first copying it onto the heap
+            return np.load(file_path, mmap_mode='r')
+        if file_path.endswith('.feather'):
+            return pd.read_feather(file_path)
+        with open(file_path, 'rb') as f:
+            return pickle.load(f)
+    
     def _create_empty_models(self):
         """Create empty models for development/testing when real models are not available"""
         import pandas as pd
@@ -62,10 +219,64 @@ class BookRecommender:
         self.pt = pd.DataFrame()
         self.books = pd.DataFrame(columns=['Book-Title', 'Book-Author', 'Image-URL-M'])
         self.similarity_scores = np.array([])
+        self._build_lookups()
         
         logger.info("Empty models created for development/testing")
     
-    def get_popular_books(self, limit: int = 50) -> List[Dict[str, Any]]:
+    def _build_lookups(self):
+        """Build in-memory lookup tables used to serve requests"""
+        # The ratings pivot table is overwhelmingly zeros and only its titles
+        # are needed to serve requests, so keep it as a CSR matrix plus index
+        # and drop the dense DataFrame
+        if self.pt is not None:
+            self.pt_index = self.pt.index.to_numpy()
+            self.pt_sparse = csr_matrix(self.pt.to_numpy(dtype=np.float32))
+            self.pt = None
+        
+        # Only the nearest neighbors of each book are ever served, so keep
+        # those and drop the full similarity matrix
+        if self.similarity_scores is not None:
+            self.top_idx, self.top_scores = top_k_neighbors(self.similarity_scores)
+            self.similarity_scores = None
+        
+        # Map each title to its author and cover so recommendations avoid
+        # scanning the books DataFrame once per recommended item
+        self._book_meta = (
+            self.books.drop_duplicates('Book-Title')
+            .set_index('Book-Title')[['Book-Author', 'Image-URL-M']]
+            .to_dict('index')
+        )
+        
+        # Map pivot table titles to row positions
+        self._title_to_pos = {title: i for i, title in enumerate(self.pt_index)}
+        self._available_books_cache = tuple(self.pt_index.tolist())
+        self._popular_books_cached.cache_clear()
+        self._search_books_cached.cache_clear()
+        
+        # Fix the numeric dtypes once so building records needs no conversion
+        self.popular_df = self.popular_df.astype({'num_ratings': 'int64', 'avg_rating': 'float64'})
+        
+        # Lowercased popular titles and authors for case-insensitive search
+        self._pop_title_lc = self.popular_df['Book-Title'].astype(str).str.lower()
+        self._pop_author_lc = self.popular_df['Book-Author'].astype(str).str.lower()
+        
+        # Trigram inverted index over popular titles and authors, mapping each
+        # trigram to the sorted row positions containing it
+        postings = {}
+        for i, (title, author) in enumerate(zip(self._pop_title_lc, self._pop_author_lc)):
+            for trigram in _trigrams(title) | _trigrams(author):
+                postings.setdefault(trigram, []).append(i)
+        self._trigram_idx = {
+            trigram: np.array(rows, dtype=np.int32) for trigram, rows in postings.items()
+        }
+    
+    @staticmethod
+    def _to_book_records(df: pd.DataFrame) -> List[Book]:
+        """Convert rows of the popular books DataFrame into Book records"""
+        rows = df[['Book-Title', 'Book-Author', 'Image-URL-M', 'num_ratings', 'avg_rating']]
+        return list(map(Book._make, rows.itertuples(index=False, name=None)))
+    
+    def get_popular_books(self, limit: int = 50) -> List[Book]:
         """
         Get the most popular books
         
@@ -76,69 +287,95 @@ class BookRecommender:
             List of popular books with their details
         """
         try:
-            popular_books = []
-            for i in range(min(limit, len(self.popular_df))):
-                book = {
-                    'title': self.popular_df.iloc[i]['Book-Title'],
-                    'author': self.popular_df.iloc[i]['Book-Author'],
-                    'image_url': self.popular_df.iloc[i]['Image-URL-M'],
-                    'votes': int(self.popular_df.iloc[i]['num_ratings']),
-                    'rating': float(self.popular_df.iloc[i]['avg_rating'])
-                }
-                popular_books.append(book)
-            return popular_books
+            # A negative limit would otherwise slice from the end
+            return list(self._popular_books_cached(max(limit, 0)))
         except Exception as e:
             logger.error(f"Error getting popular books: {e}")
             return []
     
-    def get_book_recommendations(self, book_title: str, num_recommendations: int = 5) -> List[Dict[str, Any]]:
+    def _popular_books(self, limit: int) -> Tuple[Book, ...]:
+        """Build the popular books result, cached by get_popular_books"""
+        return tuple(self._to_book_records(self.popular_df.head(limit)))
+    
+    def get_book_recommendations(self, book_title: str, num_recommendations: int = 5) -> List[RecommendedBook]:
         """
         Get book recommendations based on a given book title
         
         Args:
             book_title: Title of the book to find recommendations for
-            num_recommendations: Number of recommendations to return
+            num_recommendations: Number of recommendations to return, at most
+                max_recommendations
             
         Returns:
             List of recommended books with their details
         """
         try:
             # Find the index of the book in the pivot table
-            if book_title not in self.pt.index:
+            book_index = self._title_to_pos.get(book_title)
+            if book_index is None:
                 logger.warning(f"Book '{book_title}' not found in the dataset")
                 return []
             
-            book_index = np.where(self.pt.index == book_title)[0][0]
+            # Get similar books from the precomputed, already sorted neighbors;
+            # a negative count would otherwise slice from the end
+            num_recommendations = max(num_recommendations, 0)
+            return self._neighbors_to_books(
+                self.top_idx[book_index][:num_recommendations],
+                self.top_scores[book_index][:num_recommendations]
+            )
             
-            # Get similar books based on similarity scores
-            similar_items = sorted(
-                list(enumerate(self.similarity_scores[book_index])),
-                key=lambda x: x[1],
-                reverse=True
-            )[1:num_recommendations + 1]
+        except Exception as e:
+            logger.error(f"Error getting recommendations for '{book_title}': {e}")
+            return []
+    
+    def get_batch_recommendations(self, book_titles: List[str],
+                                  num_recommendations: int = 5) -> Dict[str, List[RecommendedBook]]:
+        """
+        Get book recommendations for several book titles at once
+        
+        Args:
+            book_titles: Titles of the books to find recommendations for
+            num_recommendations: Number of recommendations to return per book
             
-            recommendations = []
-            for item in similar_items:
-                similar_book_title = self.pt.index[item[0]]
-                temp_df = self.books[self.books['Book-Title'] == similar_book_title]
-                
-                if not temp_df.empty:
-                    book_data = temp_df.drop_duplicates('Book-Title').iloc[0]
-                    recommendation = {
-                        'title': book_data['Book-Title'],
-                        'author': book_data['Book-Author'],
-                        'image_url': book_data['Image-URL-M'],
-                        'similarity_score': float(item[1])
-                    }
-                    recommendations.append(recommendation)
+        Returns:
+            Mapping of each requested title to its recommended books; titles
+            not found in the dataset map to an empty list
+        """
+        try:
+            results = {title: [] for title in book_titles}
+            found = [title for title in results if title in self._title_to_pos]
+            if not found:
+                return results
+            
+            # Gather the neighbor rows of all found books in one indexing call
+            num_recommendations = max(num_recommendations, 0)
+            positions = np.fromiter((self._title_to_pos[title] for title in found),
+                                    dtype=np.int64, count=len(found))
+            top = self.top_idx[positions, :num_recommendations]
+            scores = self.top_scores[positions, :num_recommendations]
             
-            return recommendations
+            for title, top_row, score_row in zip(found, top, scores):
+                results[title] = self._neighbors_to_books(top_row, score_row)
+            return results
             
         except Exception as e:
-            logger.error(f"Error getting recommendations for '{book_title}': {e}")
-            return []
+            logger.error(f"Error getting batch recommendations: {e}")
+            return {title: [] for title in book_titles}
+    
+    def _neighbors_to_books(self, top: np.ndarray, scores: np.ndarray) -> List[RecommendedBook]:
+        """Convert neighbor positions and scores into RecommendedBook records"""
+        recommendations = []
+        for i, score in zip(top, scores):
+            similar_book_title = self.pt_index[i]
+            meta = self._book_meta.get(similar_book_title)
+            
+            if meta:
+                recommendations.append(RecommendedBook(
+                    similar_book_title, meta['Book-Author'], meta['Image-URL-M'], float(score)
+                ))
+        return recommendations
     
-    def search_books(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+    def search_books(self, query: str, limit: int = 10) -> List[Book]:
         """
         Search for books by title or author
         
@@ -150,39 +387,50 @@ class BookRecommender:
             List of matching books
         """
         try:
-            query = query.lower()
-            matching_books = []
-            
-            # Search in popular books first
-            for _, book in self.popular_df.iterrows():
-                if (query in book['Book-Title'].lower() or 
-                    query in book['Book-Author'].lower()):
-                    matching_books.append({
-                        'title': book['Book-Title'],
-                        'author': book['Book-Author'],
-                        'image_url': book['Image-URL-M'],
-                        'votes': int(book['num_ratings']),
-                        'rating': float(book['avg_rating'])
-                    })
-                    
-                    if len(matching_books) >= limit:
-                        break
-            
-            return matching_books
-            
+            return list(self._search_books_cached(query.lower(), limit))
         except Exception as e:
             logger.error(f"Error searching books: {e}")
             return []
     
-    def get_available_books(self) -> List[str]:
+    def _search_books(self, query: str, limit: int) -> Tuple[Book, ...]:
+        """Search popular books for a lowercased query, cached by search_books"""
+        # Queries too short to form a trigram scan all popular books
+        if len(query) < 3:
+            mask = (self._pop_title_lc.str.contains(query, regex=False, na=False) |
+                    self._pop_author_lc.str.contains(query, regex=False, na=False))
+            return tuple(self._to_book_records(self.popular_df[mask].head(limit)))
+        
+        # Intersect posting lists, smallest first, to get candidate rows
+        postings = sorted(
+            (self._trigram_idx.get(trigram) for trigram in _trigrams(query)),
+            key=lambda rows: -1 if rows is None else len(rows)
+        )
+        if postings[0] is None:
+            return ()
+        candidates = postings[0]
+        for rows in postings[1:]:
+            candidates = np.intersect1d(candidates, rows, assume_unique=True)
+            if len(candidates) == 0:
+                return ()
+        
+        # Verify the full substring on the shortlist only
+        matches = []
+        for i in candidates:
+            if query in self._pop_title_lc.iat[i] or query in self._pop_author_lc.iat[i]:
+                matches.append(i)
+                if len(matches) >= limit:
+                    break
+        return tuple(self._to_book_records(self.popular_df.iloc[matches]))
+    
+    def get_available_books(self) -> Tuple[str, ...]:
         """
-        Get list of all available book titles for autocomplete
+        Get all available book titles for autocomplete
         
         Returns:
-            List of book titles
+            Immutable tuple of book titles, cached at load time
         """
         try:
-            return list(self.pt.index)
+            return self._available_books_cache
         except Exception as e:
             logger.error(f"Error getting available books: {e}")
-            return []
+            return ()
@@ -5,16 +5,14 @@ Simple startup script for the Book Recommender application
 
 import os
 import sys
-from app import create_app
+from config import config
 
 def main():
     """Main function to run the application"""
     try:
         # Get environment from environment variable or default to development
         env = os.getenv('FLASK_ENV', 'development')
-        
-        # Create the application
-        app = create_app(env)
+        debug = config.get(env, config['default']).DEBUG
         
         # Get port from environment variable or default to 5000
         port = int(os.environ.get('PORT', 5000))
@@ -22,14 +20,26 @@ def main():
         print(f"🚀 Starting Book Recommender in {env} mode...")
         print(f"📖 Application will be available at: http://localhost:{port}")
         print(f"🔧 Environment: {env}")
-        print(f"🐛 Debug mode: {app.config['DEBUG']}")
+        print(f"🐛 Debug mode: {debug}")
         
-        # Run the application
-        app.run(
-            host='0.0.0.0',
-            port=port,
-            debug=app.config['DEBUG']
-        )
+        if debug:
+            # Use the Werkzeug server for its debugger and reloader
+            from app import create_app
+            app = create_app(env)
+            app.run(
+                host='0.0.0.0',
+                port=port,
+                debug=True
+            )
+        else:
+            # Replace this process with gunicorn using gunicorn.conf.py
+            base_dir = os.path.dirname(os.path.abspath(__file__))
+            os.execvp('gunicorn', [
+                'gunicorn',
+                '--chdir', base_dir,
+                '-c', os.path.join(base_dir, 'gunicorn.conf.py'),
+                'app:app'
+            ])
         
     except KeyboardInterrupt:
         print("\n👋 Application stopped by user")
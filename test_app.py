@@ -1,6 +1,8 @@
 import unittest
 import os
 import sys
+import gzip
+import json
 from unittest.mock import patch, MagicMock
 
 # Add the current directory to the Python path
@@ -54,5 +56,206 @@ class TestBookRecommender(unittest.TestCase):
                 data = response.get_json()
                 self.assertIn('status', data)
 
+    def test_popular_books_negative_limit(self):
+        """Test popular books endpoint rejects a negative limit"""
+        from app import create_app
+
+        app = create_app('testing')
+
+        with app.test_client() as client:
+            response = client.get('/api/books/popular?limit=-1')
+            self.assertEqual(response.status_code, 400)
+
+    def test_recommendations_limit_warning(self):
+        """Test recommendations endpoint warns when the limit is capped"""
+        from app import create_app
+
+        with patch('app.BookRecommender') as mock_recommender:
+            mock_recommender_instance = MagicMock()
+            mock_recommender_instance.get_available_books.return_value = []
+            mock_recommender_instance.get_book_recommendations.return_value = []
+            mock_recommender_instance.max_recommendations = 20
+            mock_recommender.get_instance.return_value = mock_recommender_instance
+
+            app = create_app('testing')
+
+            with app.test_client() as client:
+                response = client.get('/api/books/recommendations?book=Dune&limit=50')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.get_json()['warning'], 'Limit capped at 20 recommendations per book')
+
+                response = client.get('/api/books/recommendations?book=Dune&limit=5')
+                self.assertNotIn('warning', response.get_json())
+
+    def test_book_titles_endpoint(self):
+        """Test autocomplete titles endpoint"""
+        from app import create_app
+
+        app = create_app('testing')
+
+        with app.test_client() as client:
+            response = client.get('/api/books/titles')
+            self.assertEqual(response.status_code, 200)
+            self.assertIsInstance(response.get_json(), list)
+            self.assertIn('max-age', response.headers['Cache-Control'])
+
+            response = client.get('/api/books/titles', headers={'Accept-Encoding': 'gzip'})
+            self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+            self.assertIsInstance(json.loads(gzip.decompress(response.data)), list)
+
+    def test_batch_recommendations_endpoint(self):
+        """Test batch recommendations endpoint"""
+        from app import create_app
+
+        with patch('app.BookRecommender') as mock_recommender:
+            mock_recommender_instance = MagicMock()
+            mock_recommender_instance.get_available_books.return_value = []
+            mock_recommender_instance.get_batch_recommendations.return_value = {'Dune': []}
+            mock_recommender_instance.max_recommendations = 20
+            mock_recommender.get_instance.return_value = mock_recommender_instance
+
+            app = create_app('testing')
+
+            with app.test_client() as client:
+                response = client.post('/api/books/recommendations/batch', json={'books': ['Dune'], 'limit': 3})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.get_json(), {'recommendations': {'Dune': []}})
+                mock_recommender_instance.get_batch_recommendations.assert_called_once_with(
+                    ['Dune'], num_recommendations=3
+                )
+
+                response = client.post('/api/books/recommendations/batch', json={'limit': 3})
+                self.assertEqual(response.status_code, 400)
+
+                response = client.post('/api/books/recommendations/batch', json={'books': ['Dune'], 'limit': True})
+                self.assertEqual(response.status_code, 400)
+
+                response = client.post('/api/books/recommendations/batch', json={'books': ['Dune'] * 101})
+                self.assertEqual(response.status_code, 400)
+
+                response = client.post('/api/books/recommendations/batch', json={'books': ['Dune'], 'limit': 50})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.get_json()['warning'], 'Limit capped at 20 recommendations per book')
+
+class TestRecommenderModel(unittest.TestCase):
+    """Test cases for the BookRecommender model logic"""
+
+    def setUp(self):
+        """Build a recommender around a small in-memory popular books table"""
+        import pandas as pd
+        from models.book_recommender import BookRecommender
+
+        titles = ['Harry Potter', 'The Hobbit', 'Dune', 'The Da Vinci Code',
+                  'Harry Potter and the Chamber', 'Emma', 'The Lord of the Rings']
+        authors = ['J. K. Rowling', 'J. R. R. Tolkien', 'Frank Herbert', 'Dan Brown',
+                   'J. K. Rowling', 'Jane Austen', 'J. R. R. Tolkien']
+
+        self.recommender = BookRecommender('/nonexistent/')
+        self.recommender.popular_df = pd.DataFrame({
+            'Book-Title': titles,
+            'Book-Author': authors,
+            'Image-URL-M': ['url'] * len(titles),
+            'num_ratings': range(len(titles), 0, -1),
+            'avg_rating': [4.0] * len(titles)
+        })
+        self.recommender._build_lookups()
+
+    def scan_titles(self, query, limit):
+        """Reference search using a plain str.contains scan"""
+        df = self.recommender.popular_df
+        mask = (df['Book-Title'].str.lower().str.contains(query.lower(), regex=False) |
+                df['Book-Author'].str.lower().str.contains(query.lower(), regex=False))
+        return df[mask]['Book-Title'].head(limit).tolist()
+
+    def test_search_books_matches_scan(self):
+        """Test trigram search returns the same titles and order as a scan"""
+        for query in ['e', 'Ha', 'the', 'Harry Pot', 'tolkien', 'r. r', 'Potter Hobbit', 'zzz']:
+            for limit in [1, 2, 10]:
+                titles = [book.title for book in self.recommender.search_books(query, limit)]
+                self.assertEqual(titles, self.scan_titles(query, limit), (query, limit))
+
+        self.assertEqual(self.recommender.search_books('zzz'), [])
+
+    def test_popular_books_negative_limit(self):
+        """Test a negative limit returns no popular books"""
+        self.assertEqual(self.recommender.get_popular_books(-1), [])
+        self.assertEqual(len(self.recommender.get_popular_books(3)), 3)
+
+    def set_neighbors(self):
+        """Give the recommender a small precomputed neighbor table"""
+        import numpy as np
+
+        titles = ['A', 'B', 'C', 'D']
+        self.recommender.pt_index = np.array(titles, dtype=object)
+        self.recommender._title_to_pos = {title: i for i, title in enumerate(titles)}
+        self.recommender._book_meta = {
+            title: {'Book-Author': f'Author {title}', 'Image-URL-M': f'url-{title}'} for title in titles
+        }
+        self.recommender.top_idx = np.array([[2, 1, 3], [0, 3, 2], [3, 0, 1], [1, 2, 0]], dtype=np.int32)
+        self.recommender.top_scores = np.array(
+            [[0.9, 0.5, 0.1], [0.8, 0.4, 0.2], [0.7, 0.6, 0.3], [0.9, 0.8, 0.7]], dtype=np.float16
+        )
+
+    def test_get_book_recommendations(self):
+        """Test recommendations follow the neighbor table order"""
+        self.set_neighbors()
+
+        recommendations = self.recommender.get_book_recommendations('A', num_recommendations=2)
+        self.assertEqual([book.title for book in recommendations], ['C', 'B'])
+        self.assertEqual(recommendations[0].author, 'Author C')
+        self.assertAlmostEqual(recommendations[0].similarity_score, 0.9, places=2)
+
+        titles = [book.title for book in self.recommender.get_book_recommendations('B', 10)]
+        self.assertEqual(titles, ['A', 'D', 'C'])
+        self.assertNotIn('B', titles)
+
+        self.assertEqual(self.recommender.get_book_recommendations('A', -1), [])
+        self.assertEqual(self.recommender.get_book_recommendations('Unknown'), [])
+
+    def test_get_batch_recommendations(self):
+        """Test batch recommendations per title, including unknown and duplicate titles"""
+        self.set_neighbors()
+
+        results = self.recommender.get_batch_recommendations(['D', 'Unknown', 'A', 'D'], num_recommendations=2)
+        self.assertEqual(list(results), ['D', 'Unknown', 'A'])
+        self.assertEqual([book.title for book in results['D']], ['B', 'C'])
+        self.assertEqual([book.title for book in results['A']], ['C', 'B'])
+        self.assertEqual(results['Unknown'], [])
+        for title, books in results.items():
+            self.assertNotIn(title, [book.title for book in books])
+
+        self.assertEqual(
+            results['A'], self.recommender.get_book_recommendations('A', num_recommendations=2)
+        )
+        self.assertEqual(self.recommender.get_batch_recommendations(['Unknown']), {'Unknown': []})
+
+    def test_top_k_neighbors(self):
+        """Test neighbor ranking, k clamping and chunking"""
+        import numpy as np
+        from models.book_recommender import top_k_neighbors
+
+        rng = np.random.RandomState(0)
+        similarity = rng.rand(9, 9)
+        similarity = (similarity + similarity.T) / 2
+        np.fill_diagonal(similarity, 1.0)
+
+        top_idx, top_scores = top_k_neighbors(similarity, k=4)
+        self.assertEqual(top_idx.shape, (9, 4))
+        for book in range(9):
+            self.assertNotIn(book, top_idx[book])
+            self.assertTrue(np.all(np.diff(top_scores[book].astype(float)) <= 0))
+            others = np.delete(np.arange(9), book)
+            expected = others[np.argsort(-similarity[book, others], kind='stable')][:4]
+            np.testing.assert_array_equal(top_idx[book], expected)
+
+        # k larger than the number of other books is clamped to n - 1
+        top_idx_all, _ = top_k_neighbors(similarity, k=50)
+        self.assertEqual(top_idx_all.shape, (9, 8))
+
+        # Chunk boundaries give the same result as a single chunk
+        chunked_idx, chunked_scores = top_k_neighbors(similarity, k=4, chunk_size=2)
+        np.testing.assert_array_equal(chunked_idx, top_idx)
+        np.testing.assert_array_equal(chunked_scores, top_scores)
+
 if __name__ == '__main__':
     unittest.main()